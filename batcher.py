@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class Batcher:
+    """
+    Micro-batcher that coalesces concurrent single predictions
+
+    Incoming items are queued and a background task flushes them to a single
+    multi-input invocation once max_batch items are pending or max_wait_ms
+    has elapsed, trading a few milliseconds of latency for one RPC per batch
+    instead of one per request.
+    """
+
+    def __init__(
+        self,
+        predict_many: Callable[[List[Dict[str, Any]]], Any],
+        max_batch: int = 32,
+        max_wait_ms: float = 10.0
+    ):
+        """Initialize the batcher around a batched prediction callable"""
+        self.predict_many = predict_many
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background flush task (call from a running event loop)"""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Batcher started (max_batch={self.max_batch}, max_wait_ms={self.max_wait_ms})"
+        )
+
+    async def stop(self):
+        """Stop the background flush task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, item: Dict[str, Any]) -> Any:
+        """
+        Submit one input item and wait for its prediction
+
+        Args:
+            item: Single input dict (e.g. a question/context pair)
+
+        Returns:
+            The prediction result for this item
+        """
+        if self._queue is None:
+            raise RuntimeError("Batcher is not started")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        """Drain the queue into batches and resolve per-caller futures"""
+        while True:
+            batch = [await self._queue.get()]
+
+            # Collect more items until the batch is full or the window closes
+            deadline = asyncio.get_running_loop().time() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                predictions = await self.predict_many(items)
+            except Exception as e:
+                logger.error(f"Batched flush of {len(items)} items failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), prediction in zip(batch, predictions):
+                    if not future.done():
+                        future.set_result(prediction)
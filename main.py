@@ -1,22 +1,51 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from prometheus_client import Counter, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST, REGISTRY, generate_latest, multiprocess
+from pydantic import BaseModel, ValidationError
 import uvicorn
 from typing import Any, Dict, List, Optional
+import asyncio
 import json
 import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 
+from batcher import Batcher
 from sagemaker_client import SageMakerClient
-from models import PredictionRequest, PredictionResponse
+from models import PredictionRequest, PredictionResponse, BATCH_REQUEST_ADAPTER
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# In-process metrics: lock-free atomic updates instead of per-request log lines
+PREDICT_REQUESTS = Counter(
+    'predict_requests_total',
+    'Total prediction requests',
+    ['endpoint', 'status']
+)
+PREDICT_LATENCY = Histogram(
+    'predict_latency_seconds',
+    'Prediction request latency in seconds',
+    ['endpoint']
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop the micro-batcher with the application"""
+    batcher.start()
+    yield
+    await batcher.stop()
+
 app = FastAPI(
     title="FastAPI SageMaker Integration",
     description="A FastAPI application that integrates with SageMaker deployed models",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -31,6 +60,52 @@ app.add_middleware(
 # Initialize SageMaker client
 sagemaker_client = SageMakerClient()
 
+# Limit concurrent in-flight SageMaker calls so batch fan-out doesn't overload the endpoint
+max_concurrency = int(os.getenv("MAX_CONCURRENCY", "16"))
+prediction_semaphore = asyncio.Semaphore(max_concurrency)
+
+# Micro-batcher that fuses concurrent single predictions into one invocation
+batcher = Batcher(
+    sagemaker_client.predict_many,
+    max_batch=int(os.getenv("BATCH_MAX_SIZE", "32")),
+    max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+)
+
+async def process_single_request(request: PredictionRequest, timestamp: Optional[datetime] = None) -> PredictionResponse:
+    """
+    Process a single prediction request, returning an error response on failure
+    """
+    if timestamp is None:
+        timestamp = datetime.now(timezone.utc)
+
+    async with prediction_semaphore:
+        try:
+            # Convert request to format expected by SageMaker
+            input_data = sagemaker_client.prepare_input_bytes(request.data)
+
+            # Make prediction
+            prediction = await sagemaker_client.predict(input_data)
+
+            # Process the response
+            response_data = sagemaker_client.process_response(prediction)
+
+            return PredictionResponse(
+                prediction=response_data,
+                model_name=sagemaker_client.model_name,
+                request_id=request.request_id,
+                timestamp=timestamp
+            )
+
+        except Exception as e:
+            logger.error(f"Failed to process request {request.request_id}: {str(e)}")
+            return PredictionResponse(
+                prediction=None,
+                model_name=sagemaker_client.model_name,
+                request_id=request.request_id,
+                error=str(e),
+                timestamp=timestamp
+            )
+
 @app.get("/")
 async def root():
     """Root endpoint with basic information"""
@@ -40,8 +115,12 @@ async def root():
         "endpoints": {
             "health": "/health",
             "predict": "/predict",
+            "predict_raw": "/predict/raw",
+            "predict_stream": "/predict/stream",
             "predict_batch": "/predict/batch",
-            "model_info": "/model/info"
+            "predict_batch_async": "/predict/batch/async",
+            "model_info": "/model/info",
+            "metrics": "/metrics"
         }
     }
 
@@ -65,68 +144,221 @@ async def predict(request: PredictionRequest):
     """
     Make a single prediction using the SageMaker model
     """
+    start_time = time.perf_counter()
     try:
-        logger.info(f"Received prediction request: {request}")
-        
-        # Convert request to format expected by SageMaker
-        input_data = sagemaker_client.prepare_input(request.data)
-        
-        # Make prediction
-        prediction = await sagemaker_client.predict(input_data)
-        
-        # Process the response
-        response_data = sagemaker_client.process_response(prediction)
-        
+        logger.debug("Received prediction request req_id=%s", request.request_id)
+
+        # QA-shaped requests go through the micro-batcher so concurrent
+        # callers share a single endpoint invocation
+        qa_pair = sagemaker_client.extract_qa_pair(request.data)
+        if qa_pair is not None:
+            response_data = await batcher.submit(qa_pair)
+        else:
+            # Convert request to format expected by SageMaker
+            input_data = sagemaker_client.prepare_input_bytes(request.data)
+
+            # Make prediction
+            prediction = await sagemaker_client.predict(input_data)
+
+            # Process the response
+            response_data = sagemaker_client.process_response(prediction)
+
+        PREDICT_REQUESTS.labels(endpoint='predict', status='success').inc()
         return PredictionResponse(
             prediction=response_data,
             model_name=sagemaker_client.model_name,
             request_id=request.request_id
         )
-        
+
     except Exception as e:
+        PREDICT_REQUESTS.labels(endpoint='predict', status='error').inc()
         logger.error(f"Prediction failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    finally:
+        PREDICT_LATENCY.labels(endpoint='predict').observe(time.perf_counter() - start_time)
+
+@app.post("/predict/raw")
+async def predict_raw(raw_request: Request):
+    """
+    Forward a pre-formatted JSON body straight to the SageMaker endpoint
+
+    Skips the JSON -> Pydantic -> JSON round-trip for callers that already
+    send the endpoint's native payload shape; the response bytes are
+    returned verbatim.
+    """
+    body = await raw_request.body()
+
+    # Cheap shape check instead of full validation
+    if b'"inputs"' not in body and not (b'"question"' in body and b'"context"' in body):
+        raise HTTPException(
+            status_code=400,
+            detail="Body must contain an 'inputs' envelope or 'question' and 'context' fields"
+        )
+
+    start_time = time.perf_counter()
+    try:
+        prediction_bytes = await sagemaker_client.predict_raw(body)
+        PREDICT_REQUESTS.labels(endpoint='predict_raw', status='success').inc()
+        return Response(content=prediction_bytes, media_type="application/json")
+    except Exception as e:
+        PREDICT_REQUESTS.labels(endpoint='predict_raw', status='error').inc()
+        logger.error(f"Raw prediction failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    finally:
+        PREDICT_LATENCY.labels(endpoint='predict_raw').observe(time.perf_counter() - start_time)
+
+@app.post("/predict/stream")
+async def predict_stream(raw_request: Request):
+    """
+    Stream the SageMaker response to the caller as chunks arrive
+
+    Takes the same pre-formatted body as /predict/raw and forwards the
+    endpoint's response stream, lowering time-to-first-byte for large
+    answers.
+    """
+    body = await raw_request.body()
+
+    # Cheap shape check instead of full validation
+    if b'"inputs"' not in body and not (b'"question"' in body and b'"context"' in body):
+        raise HTTPException(
+            status_code=400,
+            detail="Body must contain an 'inputs' envelope or 'question' and 'context' fields"
+        )
+
+    # Invoke before building the response so failures surface as a 500
+    # instead of aborting a stream that already committed a 200
+    try:
+        stream = await sagemaker_client.predict_stream(body)
+    except Exception as e:
+        logger.error(f"Streaming prediction failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+    return StreamingResponse(stream, media_type="application/json")
 
 @app.post("/predict/batch", response_model=List[PredictionResponse])
-async def predict_batch(requests: List[PredictionRequest]):
+async def predict_batch(raw_request: Request):
     """
     Make batch predictions using the SageMaker model
     """
+    # Validate the raw body with the precompiled adapter, bypassing
+    # FastAPI's per-item dependency machinery for large batches
     try:
-        logger.info(f"Received batch prediction request with {len(requests)} items")
-        
-        results = []
-        for request in requests:
+        requests = BATCH_REQUEST_ADAPTER.validate_json(await raw_request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+    start_time = time.perf_counter()
+    try:
+        logger.debug("Received batch prediction request with %d items", len(requests))
+
+        # Group QA-shaped requests so they can share a single endpoint invocation
+        qa_indices = []
+        qa_items = []
+        other_indices = []
+        for i, request in enumerate(requests):
+            qa_pair = sagemaker_client.extract_qa_pair(request.data)
+            if qa_pair is not None:
+                qa_indices.append(i)
+                qa_items.append(qa_pair)
+            else:
+                other_indices.append(i)
+
+        results: List[Optional[PredictionResponse]] = [None] * len(requests)
+
+        # One timestamp for the whole batch instead of one clock read per item
+        batch_timestamp = datetime.now(timezone.utc)
+
+        # Send all QA requests as one multi-input payload; fall back to
+        # per-item calls if the batched invocation fails
+        if qa_items:
             try:
-                # Convert request to format expected by SageMaker
-                input_data = sagemaker_client.prepare_input(request.data)
-                
-                # Make prediction
-                prediction = await sagemaker_client.predict(input_data)
-                
-                # Process the response
-                response_data = sagemaker_client.process_response(prediction)
-                
-                results.append(PredictionResponse(
-                    prediction=response_data,
-                    model_name=sagemaker_client.model_name,
-                    request_id=request.request_id
-                ))
-                
+                predictions = await sagemaker_client.predict_many(qa_items)
+                for i, prediction in zip(qa_indices, predictions):
+                    results[i] = PredictionResponse(
+                        prediction=prediction,
+                        model_name=sagemaker_client.model_name,
+                        request_id=requests[i].request_id,
+                        timestamp=batch_timestamp
+                    )
             except Exception as e:
-                logger.error(f"Failed to process request {request.request_id}: {str(e)}")
-                results.append(PredictionResponse(
-                    prediction=None,
-                    model_name=sagemaker_client.model_name,
-                    request_id=request.request_id,
-                    error=str(e)
-                ))
-        
+                logger.error(f"Batched invocation failed, falling back to per-item calls: {str(e)}")
+                other_indices = sorted(other_indices + qa_indices)
+
+        # Heterogeneous payloads (and any fallback items) go through the
+        # concurrent per-item path
+        if other_indices:
+            fallback_results = await asyncio.gather(
+                *(process_single_request(requests[i], timestamp=batch_timestamp) for i in other_indices)
+            )
+            for i, response in zip(other_indices, fallback_results):
+                results[i] = response
+
+        PREDICT_REQUESTS.labels(endpoint='predict_batch', status='success').inc()
         return results
-        
+
     except Exception as e:
+        PREDICT_REQUESTS.labels(endpoint='predict_batch', status='error').inc()
         logger.error(f"Batch prediction failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+    finally:
+        PREDICT_LATENCY.labels(endpoint='predict_batch').observe(time.perf_counter() - start_time)
+
+@app.post("/predict/batch/async")
+async def predict_batch_async(raw_request: Request):
+    """
+    Submit a batch for SageMaker Async Inference
+
+    Returns immediately with an inference_id and the S3 output location;
+    poll /predict/batch/result with the output_location for the result.
+    """
+    try:
+        requests = BATCH_REQUEST_ADAPTER.validate_json(await raw_request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+    try:
+        items = []
+        for request in requests:
+            qa_pair = sagemaker_client.extract_qa_pair(request.data)
+            items.append(qa_pair if qa_pair is not None else request.data)
+
+        return await sagemaker_client.predict_async_batch(items)
+
+    except Exception as e:
+        logger.error(f"Async batch submission failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Async batch submission failed: {str(e)}")
+
+@app.get("/predict/batch/result")
+async def get_batch_result(output_location: str):
+    """
+    Fetch the result of a previously submitted async batch
+
+    Stateless: pass the output_location returned at submission, so the
+    poll works regardless of which worker accepted the batch.
+    """
+    try:
+        return await sagemaker_client.get_async_result(output_location)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to fetch async result: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch async result: {str(e)}")
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics in text exposition format
+
+    When running multiple workers, set PROMETHEUS_MULTIPROC_DIR so each
+    scrape aggregates the shared per-process files instead of sampling
+    whichever worker happened to serve it.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
 
 @app.get("/model/info")
 async def get_model_info():
@@ -141,4 +373,13 @@ async def get_model_info():
         raise HTTPException(status_code=500, detail=f"Failed to get model info: {str(e)}")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        log_level="warning",
+        access_log=False
+    )
\ No newline at end of file
@@ -1,7 +1,17 @@
-from pydantic import BaseModel, Field, field_validator, ConfigDict
+from pydantic import BaseModel, Field, StrictFloat, StrictInt, TypeAdapter, field_validator, ConfigDict
 from typing import Any, Dict, List, Optional, Union
-import uuid
-from datetime import datetime
+import itertools
+import secrets
+from datetime import datetime, timezone
+
+# Random prefix drawn once per process plus a counter: unique per worker
+# without the per-call os.urandom syscall that uuid4 pays
+_ID_PREFIX = secrets.token_hex(4)
+_ID_COUNTER = itertools.count()
+
+def _next_request_id() -> str:
+    """Generate a process-unique request id without a syscall per call"""
+    return f"{_ID_PREFIX}-{next(_ID_COUNTER)}"
 
 class QuestionAnsweringInput(BaseModel):
     """Input model for question-answering tasks"""
@@ -10,12 +20,20 @@ class QuestionAnsweringInput(BaseModel):
 
 class PredictionRequest(BaseModel):
     """Request model for predictions"""
-    data: Union[QuestionAnsweringInput, Dict[str, Any], List[Any], str, float, int] = Field(
-        ..., 
+    model_config = ConfigDict(extra='ignore')
+
+    # left_to_right stops at the first matching variant instead of smart-union
+    # scoring every member, so the common QA shape dispatches in one attempt.
+    # The numeric tail must be StrictInt before StrictFloat: StrictFloat still
+    # accepts int input under Pydantic's strict conversion table, whereas
+    # StrictInt rejects floats, so this order keeps 5 an int and 5.0 a float
+    data: Union[QuestionAnsweringInput, Dict[str, Any], List[Any], str, StrictInt, StrictFloat] = Field(
+        ...,
+        union_mode='left_to_right',
         description="Input data for prediction. For question-answering, use question and context fields."
     )
     request_id: Optional[str] = Field(
-        default_factory=lambda: str(uuid.uuid4()),
+        default_factory=_next_request_id,
         description="Unique identifier for the request"
     )
     metadata: Optional[Dict[str, Any]] = Field(
@@ -23,19 +41,12 @@ class PredictionRequest(BaseModel):
         description="Additional metadata for the request"
     )
     
-    @field_validator('data')
+    @field_validator('data', mode='after')
     @classmethod
     def validate_data(cls, v):
-        """Validate input data format"""
-        if isinstance(v, dict):
-            # Check if it's a question-answering format
-            if 'question' in v and 'context' in v:
-                return v
-            # Check if it has inputs format
-            elif 'inputs' in v:
-                return v
-            # Otherwise, assume it's valid
-            return v
+        """Coerce validated models to plain dicts so downstream code can skip conversion"""
+        if isinstance(v, QuestionAnsweringInput):
+            return v.model_dump()
         return v
 
 class QuestionAnsweringResponse(BaseModel):
@@ -64,7 +75,7 @@ class PredictionResponse(BaseModel):
         description="Error message if prediction failed"
     )
     timestamp: datetime = Field(
-        default_factory=datetime.utcnow,
+        default_factory=lambda: datetime.now(timezone.utc),
         description="Timestamp of the prediction"
     )
     processing_time_ms: Optional[float] = Field(
@@ -90,4 +101,13 @@ class HealthResponse(BaseModel):
     """Health check response"""
     status: str = Field(..., description="Health status")
     sagemaker_configured: bool = Field(..., description="Whether SageMaker is properly configured")
-    timestamp: str = Field(..., description="Timestamp of the health check") 
\ No newline at end of file
+    timestamp: str = Field(..., description="Timestamp of the health check")
+
+# Build the hot-path schemas at import time so the first request in each
+# worker doesn't pay the lazy schema-construction cost
+PredictionRequest.model_rebuild()
+PredictionResponse.model_rebuild()
+
+# Precompiled validators for parsing raw JSON bodies directly
+PREDICTION_REQUEST_ADAPTER = TypeAdapter(PredictionRequest)
+BATCH_REQUEST_ADAPTER = TypeAdapter(List[PredictionRequest]) 
\ No newline at end of file
@@ -1,12 +1,14 @@
+import asyncio
 import boto3
-import json
+from botocore.config import Config
+import orjson
 import logging
 import time
 from typing import Any, Dict, List, Optional, Union
-import numpy as np
-import pandas as pd
 from datetime import datetime
+import operator
 import os
+import uuid
 from dotenv import load_dotenv
 from pydantic import BaseModel
 
@@ -15,6 +17,9 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Bound once: a C-level accessor for the hot response-unwrapping path
+_get_prediction = operator.itemgetter('prediction')
+
 class SageMakerClient:
     """
     Client for interacting with SageMaker deployed Hugging Face models
@@ -26,25 +31,60 @@ class SageMakerClient:
         self.region = os.getenv("AWS_REGION", "eu-north-1")
         self.model_name = os.getenv("MODEL_NAME", "distilbert-base-uncased-distilled-squad")
         
+        # Async inference exchanges payloads through S3; the output prefix
+        # bounds which keys result polling is allowed to read
+        self.async_bucket = os.getenv("SAGEMAKER_ASYNC_S3_BUCKET", os.getenv("SAGEMAKER_BUCKET"))
+        self.async_prefix = os.getenv("SAGEMAKER_ASYNC_S3_PREFIX", "async-inference")
+        self.async_output_prefix = os.getenv("SAGEMAKER_ASYNC_S3_OUTPUT_PREFIX")
+
         # Initialize AWS clients
         self.sagemaker_runtime = None
         self.sagemaker = None
-        
+        self.s3 = None
+
+        # Endpoint metadata changes rarely, so describe_endpoint results are
+        # cached for a short TTL instead of hitting AWS on every call
+        self._cache_ttl = float(os.getenv("MODEL_INFO_TTL_SECONDS", "60"))
+        self._info_cache = None
+        self._info_cache_ts = 0.0
+        self._status_cache = None
+        self._status_cache_ts = 0.0
+
         self._initialize_clients()
     
     def _initialize_clients(self):
         """Initialize AWS SageMaker clients"""
         try:
+            # Tune the shared HTTP config: a larger connection pool avoids
+            # stalls under concurrent calls and TCP keep-alive reuses
+            # connections instead of re-handshaking TLS per request
+            config = Config(
+                max_pool_connections=int(os.getenv("SM_POOL_CONNECTIONS", "64")),
+                retries={"mode": "standard", "max_attempts": 3},
+                tcp_keepalive=True,
+                connect_timeout=2,
+                read_timeout=30
+            )
+
             # Initialize SageMaker Runtime client for predictions
             self.sagemaker_runtime = boto3.client(
                 'sagemaker-runtime',
-                region_name=self.region
+                region_name=self.region,
+                config=config
             )
-            
+
             # Initialize SageMaker client for endpoint management
             self.sagemaker = boto3.client(
                 'sagemaker',
-                region_name=self.region
+                region_name=self.region,
+                config=config
+            )
+
+            # Initialize S3 client for async inference payloads
+            self.s3 = boto3.client(
+                's3',
+                region_name=self.region,
+                config=config
             )
             
             logger.info(f"SageMaker clients initialized for region: {self.region}")
@@ -61,10 +101,40 @@ class SageMakerClient:
             self.sagemaker is not None
         )
     
+    def extract_qa_pair(self, data) -> Optional[Dict[str, str]]:
+        """
+        Extract a question/context pair from input data if it is QA-shaped
+
+        Args:
+            data: Input data in any of the accepted request formats
+
+        Returns:
+            Dict with 'question' and 'context' keys, or None if not QA-shaped
+        """
+        # Validated requests already arrive as plain dicts; only a bare
+        # Pydantic model still needs dumping
+        if isinstance(data, BaseModel):
+            data = data.model_dump()
+
+        if not isinstance(data, dict):
+            return None
+
+        # Unwrap an 'inputs' envelope if present
+        if 'inputs' in data and isinstance(data['inputs'], dict):
+            data = data['inputs']
+
+        if 'question' in data and 'context' in data:
+            return {
+                "question": data['question'],
+                "context": data['context']
+            }
+
+        return None
+
     def _convert_to_dict(self, obj):
         """Convert Pydantic models or other objects to dictionaries"""
         if isinstance(obj, BaseModel):
-            return obj.dict()
+            return obj.model_dump()
         elif isinstance(obj, dict):
             return {k: self._convert_to_dict(v) for k, v in obj.items()}
         elif isinstance(obj, list):
@@ -72,34 +142,43 @@ class SageMakerClient:
         else:
             return obj
     
-    def prepare_input(self, data: Union[Dict[str, Any], List[Any], str, float, int]) -> str:
+    def prepare_input_bytes(self, data: Union[Dict[str, Any], List[Any], str, float, int]) -> bytes:
         """
-        Prepare input data for Hugging Face SageMaker endpoint
+        Prepare input data for Hugging Face SageMaker endpoint as JSON bytes
+
+        The bytes go straight to invoke_endpoint's Body, so there is no
+        intermediate Python str and no extra UTF-8 encode on the way out.
         
         Args:
             data: Input data - can be a dict with 'question' and 'context', 
                   or a dict with 'inputs' containing question-answering data
             
         Returns:
-            JSON string ready for SageMaker endpoint
+            JSON bytes ready for SageMaker endpoint
         """
         try:
-            # Convert Pydantic models to dictionaries
-            data = self._convert_to_dict(data)
-            
+            # Validated requests already arrive as plain dicts, so the
+            # recursive conversion walk is only needed for the rare case of
+            # a model or a container that may still hold models
+            if isinstance(data, BaseModel):
+                data = data.model_dump()
+            elif isinstance(data, list):
+                data = self._convert_to_dict(data)
+
             # Handle different input formats
             if isinstance(data, dict):
                 # If data already has 'inputs' key, use it directly
                 if 'inputs' in data:
                     input_data = data
-                # If data has 'question' and 'context' keys, wrap in 'inputs'
+                # If data has 'question' and 'context' keys, emit the fixed
+                # QA envelope directly from the validated strings — orjson
+                # still handles escaping, but the per-request dict
+                # allocation and key handling disappear
                 elif 'question' in data and 'context' in data:
-                    input_data = {
-                        "inputs": {
-                            "question": data['question'],
-                            "context": data['context']
-                        }
-                    }
+                    return (
+                        b'{"inputs":{"question":' + orjson.dumps(data['question'])
+                        + b',"context":' + orjson.dumps(data['context']) + b'}}'
+                    )
                 # If data has other format, assume it's the inputs directly
                 else:
                     input_data = {"inputs": data}
@@ -107,8 +186,8 @@ class SageMakerClient:
                 # For other data types, wrap in inputs
                 input_data = {"inputs": data}
             
-            # Convert to JSON string
-            json_data = json.dumps(input_data)
+            # Serialize with orjson straight to bytes (boto3 accepts bytes bodies)
+            json_data = orjson.dumps(input_data)
             logger.debug(f"Prepared input data: {json_data[:200]}...")
             
             return json_data
@@ -117,12 +196,12 @@ class SageMakerClient:
             logger.error(f"Failed to prepare input data: {str(e)}")
             raise ValueError(f"Failed to prepare input data: {str(e)}")
     
-    async def predict(self, input_data: str) -> Dict[str, Any]:
+    async def predict(self, input_data: bytes) -> Dict[str, Any]:
         """
         Make a prediction using the SageMaker Hugging Face endpoint
         
         Args:
-            input_data: JSON string of input data
+            input_data: JSON bytes of input data
             
         Returns:
             Prediction response from SageMaker
@@ -130,21 +209,20 @@ class SageMakerClient:
         try:
             start_time = time.time()
             
-            # Make prediction request
-            response = self.sagemaker_runtime.invoke_endpoint(
+            # Run the blocking boto3 call in a worker thread so the event
+            # loop stays free for other requests during the round-trip
+            response = await asyncio.to_thread(
+                self.sagemaker_runtime.invoke_endpoint,
                 EndpointName=self.endpoint_name,
                 ContentType='application/json',
                 Body=input_data
             )
             
-            # Read response body
-            response_body = response['Body'].read().decode('utf-8')
-            
-            # Parse JSON response
-            prediction = json.loads(response_body)
+            # Parse JSON response directly from bytes
+            prediction = orjson.loads(response['Body'].read())
             
             processing_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-            logger.info(f"Prediction completed in {processing_time:.2f}ms")
+            logger.debug("Prediction completed in %.2fms", processing_time)
             
             return {
                 'prediction': prediction,
@@ -156,6 +234,228 @@ class SageMakerClient:
             logger.error(f"Prediction failed: {str(e)}")
             raise
     
+    async def predict_raw(self, body: bytes) -> bytes:
+        """
+        Forward a pre-formatted JSON body to the endpoint without re-encoding
+
+        Args:
+            body: JSON bytes already in the endpoint's native payload shape
+
+        Returns:
+            Raw JSON bytes of the prediction response
+        """
+        try:
+            start_time = time.time()
+
+            response = await asyncio.to_thread(
+                self.sagemaker_runtime.invoke_endpoint,
+                EndpointName=self.endpoint_name,
+                ContentType='application/json',
+                Body=body
+            )
+
+            response_body = response['Body'].read()
+
+            processing_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+            logger.debug("Raw prediction completed in %.2fms", processing_time)
+
+            return response_body
+
+        except Exception as e:
+            logger.error(f"Raw prediction failed: {str(e)}")
+            raise
+
+    async def predict_stream(self, input_data: bytes):
+        """
+        Stream a prediction response as chunks arrive from the endpoint
+
+        Uses invoke_endpoint_with_response_stream so downstream callers see
+        the first bytes of large answers before the full body has been
+        generated, instead of buffering the whole response first. The
+        invocation itself is awaited here, before any bytes are streamed,
+        so failures (bad endpoint, throttling, auth) raise to the caller
+        instead of aborting an already-committed response.
+
+        Args:
+            input_data: JSON bytes of input data
+
+        Returns:
+            Async generator yielding bytes chunks of the response payload
+        """
+        try:
+            response = await asyncio.to_thread(
+                self.sagemaker_runtime.invoke_endpoint_with_response_stream,
+                EndpointName=self.endpoint_name,
+                ContentType='application/json',
+                Body=input_data
+            )
+        except Exception as e:
+            logger.error(f"Streaming prediction failed: {str(e)}")
+            raise
+
+        async def drain():
+            # The EventStream iterator blocks on the socket, so pull each
+            # event in a worker thread to keep the loop free
+            stream = iter(response['Body'])
+            while True:
+                event = await asyncio.to_thread(next, stream, None)
+                if event is None:
+                    break
+                chunk = event.get('PayloadPart', {}).get('Bytes')
+                if chunk:
+                    yield chunk
+
+        return drain()
+
+    async def predict_many(self, items: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Make predictions for multiple inputs with a single endpoint invocation
+
+        Hugging Face containers accept a list under 'inputs', so packing the
+        whole batch into one payload avoids one HTTPS round-trip per item and
+        lets the model server run a batched forward pass.
+
+        Args:
+            items: List of input dicts (e.g. question/context pairs)
+
+        Returns:
+            List of prediction results, one per input item
+        """
+        try:
+            start_time = time.time()
+
+            # Make a single prediction request for the whole batch, off the
+            # event loop since boto3 blocks for the full round-trip
+            response = await asyncio.to_thread(
+                self.sagemaker_runtime.invoke_endpoint,
+                EndpointName=self.endpoint_name,
+                ContentType='application/json',
+                Body=orjson.dumps({"inputs": items})
+            )
+
+            # Parse JSON response directly from bytes
+            predictions = orjson.loads(response['Body'].read())
+
+            processing_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+            logger.debug("Batch prediction of %d items completed in %.2fms", len(items), processing_time)
+
+            # A single-item batch may come back as a bare dict
+            if isinstance(predictions, dict):
+                predictions = [predictions]
+
+            if len(predictions) != len(items):
+                raise ValueError(
+                    f"Expected {len(items)} predictions, got {len(predictions)}"
+                )
+
+            return predictions
+
+        except Exception as e:
+            logger.error(f"Batch prediction failed: {str(e)}")
+            raise
+
+    async def predict_async_batch(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Submit a batch for SageMaker Async Inference
+
+        The batch is written to S3 and the endpoint is invoked with the input
+        pointer, so the caller returns immediately instead of waiting for the
+        sum of all inference round-trips. Results land in the endpoint's S3
+        output location.
+
+        Args:
+            items: List of input dicts (e.g. question/context pairs)
+
+        Returns:
+            Dict with 'inference_id', 'input_location' and 'output_location'
+        """
+        try:
+            if not self.async_bucket:
+                raise ValueError("SAGEMAKER_ASYNC_S3_BUCKET is not configured")
+
+            inference_id = str(uuid.uuid4())
+            input_key = f"{self.async_prefix}/inputs/{inference_id}.json"
+            input_location = f"s3://{self.async_bucket}/{input_key}"
+
+            # Upload the batch payload to S3
+            await asyncio.to_thread(
+                self.s3.put_object,
+                Bucket=self.async_bucket,
+                Key=input_key,
+                Body=orjson.dumps({"inputs": items}),
+                ContentType='application/json'
+            )
+
+            # Invoke asynchronously with the input pointer
+            response = await asyncio.to_thread(
+                self.sagemaker_runtime.invoke_endpoint_async,
+                EndpointName=self.endpoint_name,
+                InputLocation=input_location,
+                InferenceId=inference_id,
+                ContentType='application/json'
+            )
+
+            output_location = response.get('OutputLocation')
+
+            logger.info("Submitted async batch %s with %d items", inference_id, len(items))
+
+            return {
+                "inference_id": inference_id,
+                "input_location": input_location,
+                "output_location": output_location
+            }
+
+        except Exception as e:
+            logger.error(f"Async batch submission failed: {str(e)}")
+            raise
+
+    async def get_async_result(self, output_location: str) -> Dict[str, Any]:
+        """
+        Fetch the result of a previously submitted async inference
+
+        Stateless by design: the caller passes back the output location
+        returned at submission, so any worker (or a fresh process) can
+        serve the poll. The location is only accepted inside the configured
+        async bucket (and output prefix, when set) so the endpoint cannot
+        be used to read arbitrary objects with the service's credentials.
+
+        Args:
+            output_location: S3 URI returned by predict_async_batch
+
+        Returns:
+            Dict with 'status' ('pending' or 'completed') and, once
+            completed, the 'prediction' parsed from the S3 output
+        """
+        if not output_location.startswith("s3://"):
+            raise ValueError(f"Invalid output location: {output_location}")
+
+        # Parse s3://bucket/key into its parts
+        bucket, _, key = output_location.removeprefix("s3://").partition("/")
+
+        # Only serve locations inside the configured async bucket/prefix
+        if not self.async_bucket or bucket != self.async_bucket:
+            raise ValueError(f"Output location is outside the configured async bucket: {output_location}")
+        if self.async_output_prefix and not key.startswith(self.async_output_prefix):
+            raise ValueError(f"Output location is outside the configured output prefix: {output_location}")
+
+        try:
+            response = await asyncio.to_thread(
+                self.s3.get_object,
+                Bucket=bucket,
+                Key=key
+            )
+        except self.s3.exceptions.NoSuchKey:
+            return {
+                "status": "pending",
+                "output_location": output_location
+            }
+
+        return {
+            "status": "completed",
+            "output_location": output_location,
+            "prediction": orjson.loads(response['Body'].read())
+        }
+
     def process_response(self, prediction_response: Dict[str, Any]) -> Any:
         """
         Process the prediction response from Hugging Face SageMaker endpoint
@@ -166,24 +466,17 @@ class SageMakerClient:
         Returns:
             Processed prediction result
         """
+        # For Hugging Face question-answering models, the response typically
+        # contains answer, score, start and end fields; a list-of-one wrapper
+        # is common and gets unwrapped here
         try:
-            prediction = prediction_response.get('prediction')
-            
-            # For Hugging Face question-answering models, the response typically contains:
-            # - answer: the predicted answer text
-            # - score: confidence score
-            # - start: start position in context
-            # - end: end position in context
-            
-            # If prediction is a list (common for Hugging Face models), take the first result
-            if isinstance(prediction, list) and len(prediction) > 0:
-                prediction = prediction[0]
-            
-            return prediction
-            
-        except Exception as e:
-            logger.error(f"Failed to process prediction response: {str(e)}")
-            raise
+            prediction = _get_prediction(prediction_response)
+        except KeyError:
+            return None
+
+        # type() check instead of isinstance skips the ABC machinery on the
+        # dominant plain-list case
+        return prediction[0] if type(prediction) is list and prediction else prediction
     
     def get_model_info(self) -> Dict[str, Any]:
         """
@@ -199,7 +492,11 @@ class SageMakerClient:
                     "model_name": self.model_name,
                     "region": self.region
                 }
-            
+
+            # Serve from cache while it is still fresh
+            if self._info_cache is not None and time.monotonic() - self._info_cache_ts < self._cache_ttl:
+                return self._info_cache
+
             # Get endpoint details
             response = self.sagemaker.describe_endpoint(
                 EndpointName=self.endpoint_name
@@ -215,7 +512,7 @@ class SageMakerClient:
             if config_response['ProductionVariants']:
                 instance_type = config_response['ProductionVariants'][0].get('InstanceType')
             
-            return {
+            info = {
                 "model_name": self.model_name,
                 "model_type": "Hugging Face Question-Answering",
                 "model_id": "distilbert-base-uncased-distilled-squad",
@@ -227,7 +524,14 @@ class SageMakerClient:
                 "last_modified": response.get('LastModifiedTime'),
                 "endpoint_arn": response.get('EndpointArn')
             }
-            
+
+            # Cache the successful lookup; errors are never cached so a
+            # transient AWS failure recovers on the next call
+            self._info_cache = info
+            self._info_cache_ts = time.monotonic()
+
+            return info
+
         except Exception as e:
             logger.error(f"Failed to get model info: {str(e)}")
             return {
@@ -246,13 +550,20 @@ class SageMakerClient:
         try:
             if not self.endpoint_name:
                 return "Not configured"
-            
+
+            # Serve from cache while it is still fresh
+            if self._status_cache is not None and time.monotonic() - self._status_cache_ts < self._cache_ttl:
+                return self._status_cache
+
             response = self.sagemaker.describe_endpoint(
                 EndpointName=self.endpoint_name
             )
-            
-            return response['EndpointStatus']
-            
+
+            self._status_cache = response['EndpointStatus']
+            self._status_cache_ts = time.monotonic()
+
+            return self._status_cache
+
         except Exception as e:
             logger.error(f"Failed to check endpoint status: {str(e)}")
             return f"Error: {str(e)}" 
\ No newline at end of file